@@ -3986,7 +3986,7 @@ def compute_rsd(
         # Todo: fix
 
     if algorithm == "standard":
-        approval_sets = [sorted(voter.approved) for voter in profile]
+        approval_sets = [voter.sorted_approved for voter in profile]
         # random order of dictators
         random.shuffle(approval_sets)
         committee = set()
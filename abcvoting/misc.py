@@ -45,20 +45,25 @@ class CandidateSet(set):
         if len(candidates) != len(self):
             raise ValueError(f"CandidateSet initialized with duplicate elements ({candidates}).")
 
-        for cand in candidates:
-            if not isinstance(cand, (int, np.integer)):
+        if not self:
+            return
+
+        # checking the (few) distinct types and then min/max is much faster than
+        # checking every single candidate in Python
+        for cand_type in set(map(type, self)):
+            if not issubclass(cand_type, (int, np.integer)):
                 raise TypeError(
-                    f"Object of type {str(type(cand))} not suitable as candidate, "
+                    f"Object of type {str(cand_type)} not suitable as candidate, "
                     f"only positive integers allowed."
                 )
 
-        if not all(cand >= 0 for cand in candidates):
+        if min(self) < 0:
             raise ValueError(
                 f"CandidateSet initialized with elements that are not positive "
                 f"integers ({candidates})."
             )
 
-        if num_cand is not None and any(cand >= num_cand for cand in candidates):
+        if num_cand is not None and max(self) >= num_cand:
             raise ValueError(
                 f"CandidateSet initialized with elements that are >= num_cand ({num_cand}), "
                 f"the number of candidate ({candidates})."
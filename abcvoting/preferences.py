@@ -11,10 +11,72 @@ Preference profiles and voters.
 """
 
 
-from collections import OrderedDict
+import copy
+from collections import Counter
+from functools import reduce
+from operator import attrgetter, index, or_
+import numpy as np
 from abcvoting import misc
 
 
+# `map(_weight, voters)` is faster than a generator expression accessing `voter.weight`
+_weight = attrgetter("_weight")
+
+
+def _bitmask(candidates):
+    """
+    Encode a set of candidates as an integer bitmask (bit `cand` is set iff `cand` is contained).
+
+    Parameters
+    ----------
+        candidates : iterable of int
+            A set of candidates.
+
+    Returns
+    -------
+        int
+    """
+    mask = 0
+    for cand in candidates:
+        # `index()` converts NumPy integers (which would overflow) and rejects anything else
+        mask |= 1 << index(cand)
+    return mask
+
+
+def _popcount(mask):
+    # number of candidates in a bitmask
+    return bin(mask).count("1")
+
+
+def _all_slots(cls):
+    # names of all slots of `cls`, including slots of base classes
+    return [slot for base in cls.__mro__ for slot in base.__dict__.get("__slots__", ())]
+
+
+class _ApprovalSet(misc.CandidateSet):
+    # The set of approved candidates of a voter (`Voter.approved`).
+    # It cannot be modified in place, since voters store it also as bitmask (`approved_mask`).
+    # Methods that return new sets (e.g., `|`, `&`, `copy()`) return ordinary sets.
+
+    def _modify_in_place(self, *args, **kwargs):
+        raise TypeError(
+            "The approved candidates of a voter cannot be modified in place, "
+            "assign a new set to `voter.approved` instead."
+        )
+
+    add = discard = remove = pop = clear = update = _modify_in_place
+    intersection_update = difference_update = symmetric_difference_update = _modify_in_place
+    __ior__ = __iand__ = __isub__ = __ixor__ = _modify_in_place
+
+
+def _trusted_candidate_set(candidates):
+    # Create the approval set of a voter without validating `candidates`, which must have been
+    # validated before (e.g., because they are taken from another voter).
+    candset = _ApprovalSet.__new__(_ApprovalSet)
+    set.update(candset, candidates)
+    return candset
+
+
 class Profile:
     """
     Approval profiles.
@@ -36,11 +98,18 @@ class Profile:
 
             For example, for `num_cand=5` one could have `cand_names="abcde"`.
 
+        compact_storage : bool, default=False
+            Store the approval sets of voters only as sorted tuples (and bitmasks).
+
+            This reduces the memory consumption of large profiles considerably, but
+            `Voter.approved` then creates a new set every time it is accessed, which is
+            slower. Use `Voter.contains()` and `Voter.sorted_approved` instead.
+
     Attributes
     ----------
-        candidates : list of int
+        candidates : range
 
-            List of all candidates, i.e., the list containing `0`, ..., `profile.num_cand-1`.
+            All candidates, i.e., the range containing `0`, ..., `profile.num_cand-1`.
 
         cand_names : list of str or str
 
@@ -49,28 +118,56 @@ class Profile:
             Defaults to `["0", "1", ..., str(num_cand-1)]`.
     """
 
-    def __init__(self, num_cand, cand_names=None):
+    # no instance dictionaries (saves memory, faster attribute access);
+    # note that subclasses have to declare `__slots__` for new attributes
+    __slots__ = (
+        "candidates",
+        "cand_names",
+        "_voters",
+        "_approved_candidates",
+        "_totalweight",
+        "_has_unit_weights",
+        "_matrix",
+        "_compact_storage",
+    )
+
+    def __init__(self, num_cand, cand_names=None, compact_storage=False):
         if num_cand <= 0:
             raise ValueError(str(num_cand) + " is not a valid number of candidates")
-        self.candidates = list(range(num_cand))
-        self.cand_names = [str(cand) for cand in range(num_cand)]
+        self.candidates = range(num_cand)
+        self._compact_storage = compact_storage
 
         self._voters = []  # Internal list of voters.
         # Use `Profile.add_voter()` or `Profile.add_voters()` to add voters
 
+        # Cached values, `None` if not computed yet.
+        # These are updated (or reset) when voters are added and reset by
+        # `Profile._invalidate_cache()` when voters are modified.
+        self._approved_candidates = None
+        self._totalweight = None
+        self._has_unit_weights = None
+        self._matrix = None
+
         if cand_names:
             if len(cand_names) < num_cand:
                 raise ValueError(
                     f"cand_names {str(cand_names)} has length {len(cand_names)}"
                     f"< num_cand ({num_cand})"
                 )
-            self.cand_names = [str(cand_names[i]) for i in range(num_cand)]
+            self.cand_names = [str(cand_names[cand]) for cand in self.candidates]
+        else:
+            self.cand_names = list(map(str, self.candidates))
 
     @property
     def num_cand(self):  # number of candidates
         """Number of candidates."""
         return len(self.candidates)
 
+    @property
+    def num_voters(self):  # number of voters
+        """Number of voters, i.e., `len(profile)`."""
+        return len(self._voters)
+
     def approved_candidates(self):
         """
         A set of all candidates approved by at least one voter.
@@ -79,24 +176,85 @@ class Profile:
         -------
         set of int
         """
-        _approved_candidates = set()
-        for voter in self._voters:
-            _approved_candidates.update(voter.approved)
-        return _approved_candidates
+        if self._approved_candidates is None:
+            self._approved_candidates = set()
+            for voter in self._voters:
+                self._approved_candidates.update(voter.sorted_approved)
+        # return a copy such that the cached set cannot be modified
+        return set(self._approved_candidates)
+
+    def to_matrix(self):
+        """
+        Return the profile as an approval matrix and a vector of voter weights.
+
+        Entry `(i, cand)` of the approval matrix is `1` if voter `i` approves `cand` and `0`
+        otherwise. This is the preferred input for vectorized (NumPy-based) implementations of
+        rules, as it avoids iterating over the approval sets of voters.
+
+        The result is computed only once and cached until voters are added or modified,
+        hence the returned arrays are read-only.
+
+        Returns
+        -------
+            tuple of numpy.ndarray
+                The approval matrix (`uint8`, shape `(len(profile), profile.num_cand)`) and
+                the weights of voters (`float64`, shape `(len(profile),)`).
+        """
+        if self._matrix is None:
+            num_voters = len(self._voters)
+            approval_matrix = np.zeros((num_voters, self.num_cand), dtype=np.uint8)
+            for i, voter in enumerate(self._voters):
+                approval_matrix[i, list(voter.sorted_approved)] = 1
+            weights = np.fromiter(map(_weight, self._voters), dtype=np.float64, count=num_voters)
+            approval_matrix.flags.writeable = False
+            weights.flags.writeable = False
+            self._matrix = (approval_matrix, weights)
+        return self._matrix
 
     def __len__(self):
         return len(self._voters)
 
-    def _unique_voter(self, voter):
+    def _unique_voter(self, voter, used=()):
         # we ensure that each set in self._voters is a unique object even if
         # voter.approved might not be unique, because it is used as dict key
-        # (see e.g. the variable utility in abcrules_gurobi or propositionA3.py)
+        # (see e.g. the variable utility in abcrules_gurobi or propositionA3.py);
+        # `used` contains the ids of Voter objects that are about to be added already.
+        # The returned voter does not belong to this profile yet, see `_adopt()`.
         if isinstance(voter, Voter):
-            _voter = Voter(voter.approved, weight=voter.weight, num_cand=self.num_cand)
-        else:
-            _voter = Voter(voter, num_cand=self.num_cand)
-
-        return _voter
+            # `voter` has been validated when it was created, only the bounds are missing
+            voter._check_bounds(self.num_cand)
+            if voter._profile is None and id(voter) not in used:
+                # `voter` is not part of any profile yet, hence it can be used directly
+                return voter
+            return voter._copy()
+        return Voter(voter, num_cand=self.num_cand)
+
+    def _adopt(self, voter):
+        # make `voter` (as returned by `_unique_voter()`) part of this profile;
+        # this is done only after all new voters are validated
+        voter._profile = self
+        if self._compact_storage:
+            voter._compact()
+
+    def _invalidate_cache(self):
+        # called whenever voters are modified or replaced
+        self._approved_candidates = None
+        self._totalweight = None
+        self._has_unit_weights = None
+        self._matrix = None
+
+    def _update_cache(self, new_voters):
+        # update cached values after `new_voters` have been appended (instead of recomputing)
+        self._matrix = None
+        if self._approved_candidates is not None:
+            for voter in new_voters:
+                self._approved_candidates.update(voter.sorted_approved)
+        if self._totalweight is not None:
+            self._totalweight += sum(map(_weight, new_voters))
+        if self._has_unit_weights is not None:
+            self._has_unit_weights = self._has_unit_weights and all(
+                voter.weight == 1 for voter in new_voters
+            )
 
     def add_voter(self, voter):
         """
@@ -113,7 +271,10 @@ class Profile:
         """
 
         # ensure that new voter is unique
-        self._voters.append(self._unique_voter(voter))
+        voter = self._unique_voter(voter)
+        self._adopt(voter)
+        self._voters.append(voter)
+        self._update_cache((voter,))
 
     def add_voters(self, voters):
         """
@@ -122,6 +283,9 @@ class Profile:
         Each voter is specified by a set (or list) of approved candidates
         or by an object of type Voter.
 
+        Identical approval sets (as, e.g., in `[{0, 1}] * 6`) are validated only once.
+        If one of the voters is invalid, no voter is added.
+
         Parameters
         ----------
             voters : iterable of Voter or iterable of iterables of int
@@ -131,8 +295,30 @@ class Profile:
         -------
             None
         """
+        new_voters = []
+        used = set()  # ids of Voter objects in `new_voters` that are used directly
+        validated = {}  # approval set (as tuple) -> first voter with this approval set
         for voter in voters:
-            self.add_voter(voter)
+            if isinstance(voter, Voter):
+                _voter = self._unique_voter(voter, used)
+                used.add(id(_voter))
+                new_voters.append(_voter)
+                continue
+            approved = tuple(voter)
+            # the types are part of the key, since equal values of different types (e.g., 1 and
+            # 1.0) would otherwise share the validation result of the first one
+            key = (approved, tuple(map(type, approved)))
+            if key in validated:
+                # a copy of the already validated voter, which is cheaper than validating again
+                new_voters.append(validated[key]._copy())
+            else:
+                validated[key] = self._unique_voter(approved)
+                new_voters.append(validated[key])
+        # all new voters are valid, only now they become part of this profile
+        for voter in new_voters:
+            self._adopt(voter)
+        self._voters.extend(new_voters)
+        self._update_cache(new_voters)
 
     def totalweight(self):
         """
@@ -143,7 +329,9 @@ class Profile:
             int or Fraction
                 Total weight.
         """
-        return sum(voter.weight for voter in self._voters)
+        if self._totalweight is None:
+            self._totalweight = sum(map(_weight, self._voters))
+        return self._totalweight
 
     def has_unit_weights(self):
         """
@@ -153,7 +341,9 @@ class Profile:
         -------
             bool
         """
-        return all(voter.weight == 1 for voter in self._voters)
+        if self._has_unit_weights is None:
+            self._has_unit_weights = all(voter.weight == 1 for voter in self._voters)
+        return self._has_unit_weights
 
     def __iter__(self):
         return iter(self._voters)
@@ -170,22 +360,53 @@ class Profile:
             voter : Voter or iterable of int
         """
 
+        replaced = self._voters[i]
         # ensure that new voter is unique
-        self._voters[i] = self._unique_voter(voter)
+        voter = self._unique_voter(voter)
+        self._adopt(voter)
+        self._voters[i] = voter
+        replaced._profile = None  # the replaced voter is no longer part of this profile
+        self._invalidate_cache()
+
+    def _str_set_of_candidates(self, candidates):
+        # same as `misc.str_set_of_candidates(candidates, self.cand_names)` but without
+        # converting names to strings, as `self.cand_names` contains strings already
+        cand_names = self.cand_names
+        return "{" + ", ".join(sorted([cand_names[cand] for cand in candidates])) + "}"
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in _all_slots(type(self))}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        # voters are pickled/copied without a reference to their profile (see Voter.__getstate__)
+        for voter in self._voters:
+            if voter._profile is None:
+                voter._profile = self
+
+    def __copy__(self):
+        # a voter belongs to only one profile, hence a copy of a profile needs copies of its voters
+        state = self.__getstate__()
+        state["_voters"] = [copy.copy(voter) for voter in self._voters]
+        if self._approved_candidates is not None:
+            state["_approved_candidates"] = set(self._approved_candidates)
+        profile = type(self).__new__(type(self))
+        profile.__setstate__(state)
+        return profile
 
     def __str__(self):
-        if self.has_unit_weights():
-            output = f"profile with {len(self._voters)} voters and {self.num_cand} candidates:\n"
+        num_voters = len(self._voters)
+        unit_weights = self.has_unit_weights()
+        if unit_weights:
+            output = f"profile with {num_voters} voters and {self.num_cand} candidates:\n"
         else:
-            output = (
-                f"weighted profile with {len(self._voters)} voters"
-                f" and {self.num_cand} candidates:\n"
-            )
+            output = f"weighted profile with {num_voters} voters and {self.num_cand} candidates:\n"
         for vi, voter in enumerate(self._voters):
             output += f" voter {str(vi) + ':':4s} "
-            if not self.has_unit_weights():
+            if not unit_weights:
                 output += f"{voter.weight} * "
-            output += f"{misc.str_set_of_candidates(voter.approved, self.cand_names)},\n"
+            output += f"{self._str_set_of_candidates(voter.sorted_approved)},\n"
         return output[:-2]
 
     def is_party_list(self):
@@ -198,11 +419,11 @@ class Profile:
         -------
             bool
         """
-        return all(
-            len(voter1.approved & voter2.approved) in (0, len(voter1.approved))
-            for voter1 in self._voters
-            for voter2 in self._voters
-        )
+        # approval sets are pairwise disjoint or equal iff the distinct approval sets are
+        # pairwise disjoint, i.e., iff their sizes sum up to the size of their union
+        masks = {voter.approved_mask for voter in self._voters}
+        union = reduce(or_, masks, 0)
+        return sum(_popcount(mask) for mask in masks) == _popcount(union)
 
     def str_compact(self):
         """
@@ -212,24 +433,25 @@ class Profile:
         -------
             str
         """
-        compact = OrderedDict()
+        # total weight per approval set (identified by its bitmask), in order of appearance,
+        # and one representative voter per approval set (used for formatting)
+        compact = Counter()
+        representatives = {}
         for voter in self._voters:
-            if tuple(voter.approved) in compact:
-                compact[tuple(voter.approved)] += voter.weight
-            else:
-                compact[tuple(voter.approved)] = voter.weight
-        if self.has_unit_weights():
+            compact[voter.approved_mask] += voter.weight
+            representatives.setdefault(voter.approved_mask, voter)
+        num_voters = len(self._voters)
+        unit_weights = self.has_unit_weights()
+        if unit_weights:
             output = ""
         else:
             output = "weighted "
-        output += f"profile with {len(self._voters)} voters and {self.num_cand} candidates:\n"
-        for approval_set in compact:
-            output += (
-                f" {compact[approval_set]} x "
-                f"{misc.CandidateSet(approval_set).str_with_names(self.cand_names)},\n"
-            )
+        output += f"profile with {num_voters} voters and {self.num_cand} candidates:\n"
+        for mask, weight in compact.items():
+            approval_set = representatives[mask].sorted_approved
+            output += f" {weight} x {self._str_set_of_candidates(approval_set)},\n"
         output = output[:-2]
-        if not self.has_unit_weights():
+        if not unit_weights:
             output += "\ntotal weight: " + str(self.totalweight())
         output += "\n"
 
@@ -255,15 +477,181 @@ class Voter:
 
             If this `num_cand` is provided, it is verified that `approved` does not contain
             numbers `>= num_cand`.
+
+    Attributes
+    ----------
+        approved : CandidateSet
+            The set of approved candidates.
+
+            This set cannot be modified in place (this raises a `TypeError`);
+            assign a new set to `approved` instead.
+
+        approved_mask : int
+            The set of approved candidates encoded as a bitmask, i.e., bit `cand` is set
+            if and only if `cand` is approved.
+
+            Set operations on bitmasks (`&`, `|`) are considerably faster than on sets.
+
+        weight : int or Fraction
+            The weight of the voter.
+
+    .. important::
+
+        Voters are compared and hashed by identity (not by their approval sets), since
+        voters in a profile are used as dictionary keys (e.g., in ILP models).
+        Use `Voter.signature` for caching results that only depend on the approved
+        candidates and the weight of a voter.
     """
 
+    # profiles may contain a huge number of voters, hence we avoid instance dictionaries;
+    # note that subclasses have to declare `__slots__` for new attributes
+    __slots__ = ("_profile", "_approved", "approved_mask", "_sorted_tuple", "_weight")
+
     def __init__(self, approved, weight=1, num_cand=None):
-        self.approved = misc.CandidateSet(approved, num_cand=num_cand)
+        self._profile = None  # the profile containing this voter (set by `Profile`)
+        self._set_approved(approved, num_cand=num_cand)
         self.weight = weight
 
+    @classmethod
+    def _from_trusted(cls, approved, weight=1, approved_mask=None):
+        # Create a voter without any validation. `approved` has to be a valid approval set
+        # (see `_trusted_candidate_set()`) that is not used elsewhere and `weight` a valid weight.
+        voter = cls.__new__(cls)
+        voter._profile = None
+        voter._approved = approved
+        voter.approved_mask = _bitmask(approved) if approved_mask is None else approved_mask
+        voter._sorted_tuple = None
+        voter._weight = weight
+        return voter
+
+    def _copy(self):
+        # a copy of this voter (not belonging to any profile), skipping validation
+        return Voter._from_trusted(
+            _trusted_candidate_set(self.sorted_approved),
+            weight=self._weight,
+            approved_mask=self.approved_mask,
+        )
+
+    def _check_bounds(self, num_cand):
+        # verify that all approved candidates are < num_cand
+        if self.approved_mask >> num_cand:
+            raise ValueError(
+                f"Voter {self} contains candidates that are >= num_cand ({num_cand}), "
+                f"the number of candidates."
+            )
+
+    def _compact(self):
+        # store approved candidates only as sorted tuple (see `Profile(compact_storage=True)`)
+        self._sorted_tuple = self.sorted_approved
+        self._approved = None
+
+    def contains(self, cand):
+        """
+        Check whether `cand` is approved by this voter.
+
+        This is faster than `cand in voter.approved`, in particular for profiles with
+        `compact_storage=True`.
+
+        Parameters
+        ----------
+            cand : int
+                A candidate.
+
+        Returns
+        -------
+            bool
+        """
+        return bool(self.approved_mask >> cand & 1)
+
+    def __getstate__(self):
+        # the profile containing this voter is neither pickled nor copied with the voter
+        return {
+            slot: getattr(self, slot)
+            for slot in _all_slots(type(self))
+            if slot != "_profile" and hasattr(self, slot)
+        }
+
+    def __setstate__(self, state):
+        self._profile = None
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @property
+    def approved(self):
+        """The set of approved candidates."""
+        if self._approved is None:
+            # compact storage, see `Profile(compact_storage=True)`
+            return _trusted_candidate_set(self._sorted_tuple)
+        return self._approved
+
+    @approved.setter
+    def approved(self, approved):
+        self._set_approved(approved)
+
+    def _set_approved(self, approved, num_cand=None):
+        if type(approved) is _ApprovalSet:
+            # the approval set of another voter has been validated already and cannot have been
+            # modified since, only the bounds are left to check
+            self._approved = _trusted_candidate_set(approved)
+            self.approved_mask = _bitmask(approved)
+            if num_cand is not None:
+                self._check_bounds(num_cand)
+        else:
+            self._approved = _ApprovalSet(approved, num_cand=num_cand)
+            self.approved_mask = _bitmask(self._approved)
+        self._sorted_tuple = None  # computed lazily by `sorted_approved`
+        if self._profile is not None:
+            self._profile._invalidate_cache()
+            if self._profile._compact_storage:
+                self._compact()
+
+    @property
+    def sorted_approved(self):
+        """
+        The approved candidates as a sorted tuple.
+
+        This tuple is computed only once (`approved` cannot be modified in place).
+        """
+        if self._sorted_tuple is None:
+            self._sorted_tuple = tuple(sorted(self._approved))
+        return self._sorted_tuple
+
+    @property
+    def signature(self):
+        """
+        A hashable representation of the approved candidates and the weight of this voter.
+
+        Voters with the same signature are interchangeable (e.g., they contribute the same
+        score). Thus, the signature can be used as dictionary key to compute something only
+        once for all identical voters.
+
+        .. doctest::
+
+            >>> Voter([0, 2]).signature == Voter([2, 0]).signature
+            True
+            >>> Voter([0, 2]).signature == Voter([0, 2], weight=2).signature
+            False
+
+        Returns
+        -------
+            tuple
+                The pair `(approved_mask, weight)`.
+        """
+        return self.approved_mask, self._weight
+
+    @property
+    def weight(self):
+        """The weight of the voter."""
+        return self._weight
+
+    @weight.setter
+    def weight(self, weight):
         # check weights
-        if self.weight <= 0:
+        if weight <= 0:
             raise ValueError("Weight should be a number > 0.")
+        self._weight = weight
+        if self._profile is not None:
+            self._profile._invalidate_cache()
 
     def __str__(self):
         return str(self.approved)
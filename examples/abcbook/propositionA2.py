@@ -32,11 +32,12 @@ print(profile.str_compact())
 
 print("winning committees for k=1 and k=2:")
 for rule_id in ["pav", "cc", "monroe", "minimaxphragmen", "minimaxav"]:
-    comm1 = abcrules.compute(rule_id, profile, 1, resolute=True)[0]
-    comm2 = abcrules.compute(rule_id, profile, 2, resolute=True)[0]
+    rule = abcrules.Rule(rule_id)
+    comm1 = rule.compute(profile, 1, resolute=True)[0]
+    comm2 = rule.compute(profile, 2, resolute=True)[0]
     print(
         " "
-        + abcrules.Rule(rule_id).shortname
+        + rule.shortname
         + ": "
         + misc.str_set_of_candidates(comm1, cand_names)
         + " vs "
@@ -61,10 +62,11 @@ print(profile.str_compact())
 
 print("winning committees for k=2 and k=3:")
 for rule_id in ["greedy-monroe"]:
-    comm1 = abcrules.compute(rule_id, profile, 2, resolute=True)[0]
-    comm2 = abcrules.compute(rule_id, profile, 3, resolute=True)[0]
+    rule = abcrules.Rule(rule_id)
+    comm1 = rule.compute(profile, 2, resolute=True)[0]
+    comm2 = rule.compute(profile, 3, resolute=True)[0]
     print(
-        f" {abcrules.Rule(rule_id).shortname}: "
+        f" {rule.shortname}: "
         f"{misc.str_set_of_candidates(comm1, cand_names)} vs "
         f"{misc.str_set_of_candidates(comm2, cand_names)}"
     )
@@ -84,14 +86,11 @@ print(misc.header("3rd profile:"))
 print(profile.str_compact())
 
 print("winning committees for k=3 and k=4:")
-comm1 = abcrules.compute(
-    "equal-shares", profile, 3, resolute=True, algorithm="standard-fractions"
-)[0]
-comm2 = abcrules.compute(
-    "equal-shares", profile, 4, resolute=True, algorithm="standard-fractions"
-)[0]
+rule = abcrules.Rule("equal-shares")
+comm1 = rule.compute(profile, 3, resolute=True, algorithm="standard-fractions")[0]
+comm2 = rule.compute(profile, 4, resolute=True, algorithm="standard-fractions")[0]
 print(
-    f" {abcrules.Rule('equal-shares').shortname}: "
+    f" {rule.shortname}: "
     f"{misc.str_set_of_candidates(comm1, cand_names)} vs "
     f"{misc.str_set_of_candidates(comm2, cand_names)}"
 )
@@ -2,6 +2,7 @@
 Unit tests for abcvoting/misc.py.
 """
 
+import numpy as np
 import pytest
 from abcvoting import misc
 from abcvoting.preferences import Profile
@@ -75,3 +76,12 @@ def test_verify_expected_committees_equals_actual_committees():
         misc.verify_expected_committees_equals_actual_committees(
             [[0]], [[1], [2], [3]], resolute=True, shortname="Rule"
         )
+
+
+def test_candidateset_numpy_integers():
+    candset = misc.CandidateSet(np.arange(4), num_cand=4)
+    assert candset == {0, 1, 2, 3}
+    with pytest.raises(ValueError):
+        misc.CandidateSet(np.arange(4), num_cand=3)
+    with pytest.raises(TypeError):
+        misc.CandidateSet([np.int64(1), np.float64(2)])
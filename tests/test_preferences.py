@@ -2,6 +2,9 @@
 Unit tests for abcvoting/preferences.py.
 """
 
+import copy
+import pickle
+import numpy as np
 import pytest
 from abcvoting.preferences import Profile, Voter
 from abcvoting.misc import CandidateSet
@@ -122,3 +125,327 @@ def test_approved_candidates():
     assert profile.approved_candidates() == {0, 1, 3, 4, 5, 7, 8}
     profile[0].approved = [1, 5]
     assert profile.approved_candidates() == {0, 1, 4, 5, 7, 8}
+
+
+def test_approved_mask():
+    voter = Voter([0, 2, 5])
+    assert voter.approved_mask == 0b100101
+    voter.approved = [1, 70]
+    assert voter.approved_mask == (1 << 1) | (1 << 70)
+    assert Voter([]).approved_mask == 0
+    assert Voter([np.int64(70)]).approved_mask == 1 << 70
+    profile = Profile(20000)
+    profile.add_voters([[0, 19999], [7]])
+    assert profile.approved_candidates() == {0, 7, 19999}
+
+
+@pytest.mark.parametrize("compact_storage", [False, True])
+def test_approved_cannot_be_modified_in_place(compact_storage):
+    profile = Profile(5, compact_storage=compact_storage)
+    profile.add_voters([[0], [1]])
+    voter = profile[0]
+    with pytest.raises(TypeError):
+        voter.approved.add(3)
+    with pytest.raises(TypeError):
+        voter.approved.update([3])
+    with pytest.raises(TypeError):
+        voter.approved.discard(0)
+    with pytest.raises(TypeError):
+        voter.approved |= {3}
+    assert voter.approved == {0}
+    assert profile.approved_candidates() == {0, 1}
+
+    # operations returning new sets are fine
+    assert voter.approved | {3} == {0, 3}
+    approved = voter.approved.copy()
+    approved.add(3)
+    assert approved == {0, 3}
+    voter.approved = approved
+    assert profile.approved_candidates() == {0, 1, 3}
+    assert pickle.loads(pickle.dumps(voter.approved)) == {0, 3}
+
+
+@pytest.mark.parametrize("num_voters", [5, 40])
+def test_party_list_large(num_voters):
+    profile = Profile(6)
+    profile.add_voters([[0, 1], [2], [3, 4, 5]] * num_voters)
+    assert profile.is_party_list()
+    profile.add_voter([])
+    assert profile.is_party_list()
+    profile.add_voter([1, 2])
+    assert not profile.is_party_list()
+
+
+def test_cached_values_are_updated():
+    profile = Profile(10)
+    profile.add_voters([[0, 1], [2]])
+    assert profile.approved_candidates() == {0, 1, 2}
+    assert profile.totalweight() == 2
+    assert profile.has_unit_weights()
+
+    profile.add_voter(Voter([4], weight=3))
+    assert profile.approved_candidates() == {0, 1, 2, 4}
+    assert profile.totalweight() == 5
+    assert not profile.has_unit_weights()
+
+    profile[2] = [5, 6]
+    assert profile.approved_candidates() == {0, 1, 2, 5, 6}
+    assert profile.totalweight() == 3
+    assert profile.has_unit_weights()
+
+    profile[1].weight = 2
+    assert profile.totalweight() == 4
+    assert not profile.has_unit_weights()
+    with pytest.raises(ValueError):
+        profile[1].weight = 0
+
+
+def test_approved_candidates_is_a_copy():
+    profile = Profile(20000)
+    profile.add_voters([[0, 19999], [7]])
+    approved_candidates = profile.approved_candidates()
+    assert approved_candidates == {0, 7, 19999}
+    approved_candidates.add(3)
+    assert profile.approved_candidates() == {0, 7, 19999}
+
+
+def test_pickle_and_copy_voters_without_profile():
+    profile = Profile(5)
+    profile.add_voters([[0, 1]] * 1000)
+    voter = profile[0]
+    assert len(pickle.dumps(voter)) < 1000
+    for voter_copy in [pickle.loads(pickle.dumps(voter)), copy.deepcopy(voter)]:
+        assert voter_copy._profile is None
+        assert voter_copy.approved == {0, 1}
+        assert voter_copy.approved_mask == voter.approved_mask
+
+    for profile_copy in [pickle.loads(pickle.dumps(profile)), copy.deepcopy(profile)]:
+        assert all(voter._profile is profile_copy for voter in profile_copy)
+        assert profile_copy.approved_candidates() == {0, 1}
+        profile_copy[1].approved = [4]
+        assert profile_copy.approved_candidates() == {0, 1, 4}
+    assert profile.approved_candidates() == {0, 1}
+
+
+def test_shallow_copy():
+    profile = Profile(5)
+    profile.add_voters([[0], [1]])
+    assert profile.approved_candidates() == {0, 1}
+    profile_copy = copy.copy(profile)
+    assert all(voter._profile is profile for voter in profile)
+    assert all(voter._profile is profile_copy for voter in profile_copy)
+    assert all(voter not in profile_copy for voter in profile)
+
+    profile[0].approved = [2]
+    assert profile.approved_candidates() == {1, 2}
+    assert profile_copy.approved_candidates() == {0, 1}
+    profile_copy.add_voter([3])
+    assert len(profile) == 2
+    assert profile.approved_candidates() == {1, 2}
+    assert profile_copy.approved_candidates() == {0, 1, 3}
+
+
+def test_replaced_voter_leaves_profile():
+    profile = Profile(5)
+    profile.add_voters([[0], [1]])
+    replaced = profile[0]
+    profile[0] = [2]
+    assert replaced._profile is None
+    assert profile.approved_candidates() == {1, 2}
+    replaced.approved = [3]
+    assert profile.approved_candidates() == {1, 2}
+    profile.add_voter(replaced)
+    assert profile[2] is replaced
+
+
+def test_add_voter_object():
+    profile = Profile(5)
+    voter = Voter([0, 2], weight=2)
+    profile.add_voter(voter)
+    profile.add_voter(voter)
+    assert profile[0] is voter
+    assert profile[1] is not voter
+    assert profile[1].approved == voter.approved
+    assert profile[1].approved is not voter.approved
+    assert profile[1].weight == 2
+    with pytest.raises(TypeError):
+        profile[1].approved.add(1)
+
+    other_profile = Profile(3)
+    other_profile.add_voter(voter)
+    assert other_profile[0] is not voter
+    with pytest.raises(ValueError):
+        other_profile.add_voter(Voter([1, 3]))
+
+
+def test_setitem_invalid_index():
+    profile = Profile(5)
+    profile.add_voter([0])
+    voter = Voter([1])
+    with pytest.raises(IndexError):
+        profile[1] = voter
+    assert voter._profile is None
+    assert list(profile) == [profile[0]]
+    profile.add_voter(voter)
+    assert profile[1] is voter
+
+
+def test_str_compact():
+    profile = Profile(3, cand_names="abc")
+    profile.add_voters([[0, 2], [1], [2, 0], [1], [0, 2]])
+    assert profile.str_compact() == (
+        "profile with 5 voters and 3 candidates:\n 3 x {a, c},\n 2 x {b}\n"
+    )
+    profile.add_voter(Voter([1], weight=2))
+    assert profile.str_compact() == (
+        "weighted profile with 6 voters and 3 candidates:\n"
+        " 3 x {a, c},\n 4 x {b}\ntotal weight: 7\n"
+    )
+
+
+def test_str_compact_many_candidates():
+    num_cand = 20000
+    profile = Profile(num_cand)
+    profile.add_voters([[num_cand - 1, 0], [5000]] * 1000)
+    assert profile.str_compact() == (
+        f"profile with 2000 voters and {num_cand} candidates:\n"
+        f" 1000 x {{0, {num_cand - 1}}},\n 1000 x {{5000}}\n"
+    )
+
+
+def test_cand_names():
+    profile = Profile(3, cand_names=["a", 3, "b", "c"])
+    assert profile.cand_names == ["a", "3", "b"]
+    assert list(profile.candidates) == [0, 1, 2]
+    assert Profile(3).cand_names == ["0", "1", "2"]
+    # cand_names only has to support indexing
+    assert Profile(2, cand_names={0: "a", 1: "b"}).cand_names == ["a", "b"]
+
+
+def test_add_voters_identical_approval_sets():
+    profile = Profile(4)
+    approval_set = {0, 2}
+    profile.add_voters([approval_set] * 3 + [[1], (x for x in [3])])
+    assert len(profile) == 5
+    assert len({id(voter) for voter in profile}) == 5
+    assert len({id(voter.approved) for voter in profile}) == 5
+    assert all(profile[i].approved == approval_set for i in range(3))
+    assert profile[4].approved == {3}
+
+    with pytest.raises(ValueError):
+        profile.add_voters([[0], [1, 1]])
+    with pytest.raises(ValueError):
+        profile.add_voters([[0], [4]])
+    # equal, but not valid
+    with pytest.raises(TypeError):
+        profile.add_voters([[1], [1.0]])
+    assert len(profile) == 5
+
+
+@pytest.mark.parametrize("compact_storage", [False, True])
+def test_add_voters_invalid_batch(compact_storage):
+    profile = Profile(5, compact_storage=compact_storage)
+    voter = Voter([0, 1])
+    with pytest.raises(ValueError):
+        profile.add_voters([voter, voter, [5]])
+    assert len(profile) == 0
+    assert voter._profile is None
+    assert voter._approved is not None
+    profile.add_voter(voter)
+    assert profile[0] is voter
+
+    profile.add_voters([voter, voter])
+    assert len({id(v) for v in profile}) == 3
+
+
+def test_sorted_approved():
+    voter = Voter([5, 0, 3])
+    assert voter.sorted_approved == (0, 3, 5)
+    assert voter.sorted_approved is voter.sorted_approved
+    voter.approved = [2, 1]
+    assert voter.sorted_approved == (1, 2)
+
+
+def test_no_instance_dict():
+    profile = Profile(3)
+    profile.add_voter([0, 1])
+    with pytest.raises(AttributeError):
+        profile.some_attribute = 1
+    with pytest.raises(AttributeError):
+        profile[0].some_attribute = 1
+
+
+def test_num_voters():
+    profile = Profile(3)
+    assert profile.num_voters == 0
+    profile.add_voters([[0], [1, 2], [0]])
+    assert profile.num_voters == len(profile) == 3
+
+
+def test_voter_from_approved_of_other_voter():
+    other_voter = Voter([0, 3])
+    voter = Voter(other_voter.approved, num_cand=4)
+    assert voter.approved == other_voter.approved
+    assert voter.approved is not other_voter.approved
+    assert isinstance(voter.approved, CandidateSet)
+    assert voter.approved_mask == 0b1001
+    with pytest.raises(ValueError):
+        Voter(other_voter.approved, num_cand=3)
+
+    # a CandidateSet can be modified after its creation, hence it is validated again
+    candset = CandidateSet([0, 3])
+    candset.add(2.7)
+    with pytest.raises(TypeError):
+        Voter(candset)
+
+
+@pytest.mark.parametrize("compact_storage", [False, True])
+def test_to_matrix(compact_storage):
+    profile = Profile(4, compact_storage=compact_storage)
+    profile.add_voters([[0, 2], [], Voter([3], weight=2)])
+    approval_matrix, weights = profile.to_matrix()
+    assert approval_matrix.tolist() == [[1, 0, 1, 0], [0, 0, 0, 0], [0, 0, 0, 1]]
+    assert weights.tolist() == [1, 1, 2]
+    assert profile.to_matrix()[0] is approval_matrix
+    with pytest.raises(ValueError):
+        approval_matrix[0, 0] = 0
+
+    profile.add_voter([1])
+    approval_matrix, weights = profile.to_matrix()
+    assert approval_matrix.shape == (4, 4)
+    profile[0].approved = [3]
+    approval_matrix, weights = profile.to_matrix()
+    assert approval_matrix[0].tolist() == [0, 0, 0, 1]
+
+
+def test_signature():
+    profile = Profile(4)
+    profile.add_voters([[0, 1], [1, 0], Voter([0, 1], weight=2), [3]])
+    assert len({voter.signature for voter in profile}) == 3
+    # voters are still distinct dictionary keys
+    assert len({voter: None for voter in profile}) == 4
+    assert profile[0] != profile[1]
+
+
+@pytest.mark.parametrize("compact_storage", [False, True])
+def test_compact_storage(compact_storage):
+    profile = Profile(5, compact_storage=compact_storage)
+    profile.add_voters([[3, 0], [1], Voter([2, 4], weight=2)])
+    assert profile[0].approved == {0, 3}
+    assert isinstance(profile[0].approved, CandidateSet)
+    assert profile[0].sorted_approved == (0, 3)
+    assert profile[0].contains(3)
+    assert not profile[0].contains(4)
+    assert profile.approved_candidates() == {0, 1, 2, 3, 4}
+    assert profile.is_party_list()
+    profile[1].approved = [4, 1]
+    assert profile[1].approved == {1, 4}
+    assert profile[1].sorted_approved == (1, 4)
+    other_profile = Profile(5)
+    other_profile.add_voter(profile[2])
+    assert other_profile[0].approved == {2, 4}
+    assert other_profile[0].weight == 2
+
+    profile_copy = copy.copy(profile)
+    assert profile_copy[0].approved == {0, 3}
+    assert pickle.loads(pickle.dumps(profile))[1].sorted_approved == (1, 4)